@@ -0,0 +1,253 @@
+"""Low-level scanner for the LCM tokenizer.
+
+scan_next(buf, pos) finds the next raw token in `buf` starting at `pos`
+and returns a plain tuple (kind, start, end, new_pos):
+
+  kind     one of the SCAN_* constants below
+  start    offset of the first character of the token
+  end      offset one past the last character of the raw token text
+  new_pos  where scanning should resume
+
+The scanner only locates token spans; decoding, escape handling and
+comment stripping are done by the caller (lcm_tokenize) on the raw
+slice. scan_all(buf) drains a whole buffer into a list of such tuples,
+ending with a terminal kind (EOF or an error).
+
+Two implementations are provided: a branchy integer state machine that
+Numba can JIT into native code, and a regex-based scanner used when
+Numba is not available (bulk regex matches are the fastest pure-Python
+option). The fastest available backend is selected at import time.
+"""
+
+import os
+import re
+
+# No '.' so that name spaces are one token.
+SINGLE_CHAR_TOKENS = frozenset(b"();\",:'[]")
+OPERATOR_CHARS = frozenset(b"!~<>=&|^%*+=")
+
+# ASCII whitespace, matching what isspace() accepts in the C locale.
+# Hot paths never call isspace(); they test the CLASS_WS bit below (or
+# the equivalent regex character class).
+WHITESPACE = frozenset(b" \t\r\n\v\f")
+
+# Character-class bit flags, indexed by byte value: one C-level indexed
+# load per character instead of a hashed set probe.
+CLASS_OP = 1
+CLASS_SINGLE = 2
+CLASS_WS = 4
+
+_CLASS = bytearray(256)
+for _b in OPERATOR_CHARS:
+    _CLASS[_b] |= CLASS_OP
+for _b in SINGLE_CHAR_TOKENS:
+    _CLASS[_b] |= CLASS_SINGLE
+for _b in WHITESPACE:
+    _CLASS[_b] |= CLASS_WS
+_CLASS = bytes(_CLASS)
+
+# Raw token kinds.
+SCAN_EOF = 0
+SCAN_OTHER = 1
+SCAN_CHAR_LITERAL = 2
+SCAN_STRING = 3
+SCAN_STRING_UNTERMINATED = 4
+SCAN_LINE_COMMENT = 5
+SCAN_BLOCK_COMMENT = 6
+SCAN_BLOCK_COMMENT_UNTERMINATED = 7
+SCAN_INVALID = 8
+
+# One alternation covering every token kind, tried in priority order so
+# the regex backend dispatches with a single C-level match per token.
+# Each alternative corresponds to one scan kind via _KIND_BY_GROUP.
+_SINGLE_CLASS = re.escape(bytes(sorted(SINGLE_CHAR_TOKENS)))
+_BLOB_CLASS = re.escape(
+    bytes(sorted(WHITESPACE | SINGLE_CHAR_TOKENS | OPERATOR_CHARS))
+)
+_TOKEN_RE = re.compile(
+    rb"(?P<ws>[ \t\r\n\v\f]+)"
+    rb"|(?P<block_comment>/\*.*?\*/)"
+    rb"|(?P<block_unterm>/\*.*)"
+    rb"|(?P<line_comment>//[^\n]*)"
+    rb'|(?P<string>"(?:[^"\\]|\\.)*")'
+    rb'|(?P<string_unterm>"(?:[^"\\]|\\.)*\\?)'
+    rb"|(?P<char>'(?:\\.|.)')"
+    rb"|(?P<char_bad>')"
+    rb"|(?P<op>[!~<>=&|^%*+]+)"
+    rb"|(?P<slash>/)"
+    rb"|(?P<single>[" + _SINGLE_CLASS + rb"])"
+    rb"|(?P<blob>[^" + _BLOB_CLASS + rb"]+)",
+    re.DOTALL,
+)
+
+# The class table used by the state machine. Replaced by a numpy view
+# when the Numba backend is selected.
+_CLASS_TBL = _CLASS
+
+
+def _scan_machine(buf, pos):
+    """Integer state machine over the byte buffer. Numba-compilable."""
+    n = len(buf)
+
+    # Skip whitespace.
+    while pos < n and _CLASS_TBL[buf[pos]] & 4:
+        pos += 1
+    if pos == n:
+        return (SCAN_EOF, n, n, n)
+
+    start = pos
+    c = buf[pos]
+
+    # Character literal?
+    if c == 39:  # '
+        i = pos + 1
+        if i < n and buf[i] == 92:  # backslash
+            i += 1
+        i += 1  # The literal character itself.
+        if i >= n or buf[i] != 39:
+            return (SCAN_INVALID, start, min(i, n), min(i, n))
+        return (SCAN_CHAR_LITERAL, start, i + 1, i + 1)
+
+    # String literal?
+    if c == 34:  # "
+        i = pos + 1
+        while i < n:
+            b = buf[i]
+            if b == 92:  # Escape: skip the pair.
+                i += 2
+                continue
+            if b == 34:
+                return (SCAN_STRING, start, i + 1, i + 1)
+            i += 1
+        return (SCAN_STRING_UNTERMINATED, start, n, n)
+
+    # Operator?
+    if _CLASS_TBL[c] & 1:
+        i = pos + 1
+        while i < n and _CLASS_TBL[buf[i]] & 1:
+            i += 1
+        return (SCAN_OTHER, start, i, i)
+
+    # Comment?
+    if c == 47:  # /
+        if pos + 1 < n and buf[pos + 1] == 42:  # /*
+            j = pos + 2
+            while j + 1 < n and not (buf[j] == 42 and buf[j + 1] == 47):
+                j += 1
+            if j + 1 >= n:
+                return (SCAN_BLOCK_COMMENT_UNTERMINATED, start, n, n)
+            return (SCAN_BLOCK_COMMENT, start, j + 2, j + 2)
+        if pos + 1 < n and buf[pos + 1] == 47:  # //
+            j = pos + 2
+            while j < n and buf[j] != 10:
+                j += 1
+            return (SCAN_LINE_COMMENT, start, j, j)
+        # A lone '/' is treated like an operator.
+        return (SCAN_OTHER, start, pos + 1, pos + 1)
+
+    # Single-char token?
+    if _CLASS_TBL[c] & 2:
+        return (SCAN_OTHER, start, pos + 1, pos + 1)
+
+    # Otherwise, an alpha-numeric blob.
+    i = pos + 1
+    while i < n and not _CLASS_TBL[buf[i]] & 7:
+        i += 1
+    return (SCAN_OTHER, start, i, i)
+
+
+_KIND_BY_GROUP = {
+    "block_comment": SCAN_BLOCK_COMMENT,
+    "block_unterm": SCAN_BLOCK_COMMENT_UNTERMINATED,
+    "line_comment": SCAN_LINE_COMMENT,
+    "string": SCAN_STRING,
+    "string_unterm": SCAN_STRING_UNTERMINATED,
+    "char": SCAN_CHAR_LITERAL,
+    "char_bad": SCAN_INVALID,
+    "op": SCAN_OTHER,
+    "slash": SCAN_OTHER,
+    "single": SCAN_OTHER,
+    "blob": SCAN_OTHER,
+}
+
+
+def _scan_regex(buf, pos):
+    """Regex-based scanner with the same contract as _scan_machine."""
+    match = _TOKEN_RE.match(buf, pos)
+    if match is not None and match.lastgroup == "ws":
+        pos = match.end()
+        match = _TOKEN_RE.match(buf, pos)
+    if match is None:
+        return (SCAN_EOF, pos, pos, pos)
+    end = match.end()
+    return (_KIND_BY_GROUP[match.lastgroup], match.start(), end, end)
+
+
+def _is_terminal(kind):
+    return kind == SCAN_EOF or kind >= SCAN_BLOCK_COMMENT_UNTERMINATED
+
+
+def _scan_all_from(scan):
+    """Build a scan_all() that drains a buffer through `scan`."""
+
+    def scan_all(buf):
+        out = []
+        pos = 0
+        while True:
+            res = scan(buf, pos)
+            out.append(res)
+            if _is_terminal(res[0]):
+                return out
+            pos = res[3]
+
+    return scan_all
+
+
+def _select_backend():
+    # LCM_SCAN_BACKEND forces a specific scanner: "regex" (pure-Python
+    # default), "machine" (the interpreted state machine, which can win
+    # under JIT-ing interpreters), or "numba". Unset/unknown values pick
+    # the fastest available automatically.
+    choice = os.environ.get("LCM_SCAN_BACKEND", "").lower()
+    if choice == "regex":
+        return _scan_regex, _scan_all_from(_scan_regex)
+    if choice == "machine":
+        return _scan_machine, _scan_all_from(_scan_machine)
+
+    try:
+        import numba
+        import numpy
+    except ImportError:
+        return _scan_regex, _scan_all_from(_scan_regex)
+
+    global _CLASS_TBL
+    try:
+        _CLASS_TBL = numpy.frombuffer(_CLASS, dtype=numpy.uint8)
+        jit = numba.njit(nogil=True)
+        jit_next = numba.njit(cache=True, nogil=True)(_scan_machine)
+
+        # Build the whole result list inside compiled code so bulk
+        # callers cross the Python/JIT boundary once per file rather
+        # than once per token.
+        @jit
+        def jit_all(buf):
+            out = []
+            pos = 0
+            while True:
+                res = jit_next(buf, pos)
+                out.append(res)
+                kind = res[0]
+                if kind == SCAN_EOF or kind >= SCAN_BLOCK_COMMENT_UNTERMINATED:
+                    return out
+                pos = res[3]
+
+        # Compile eagerly; fall back on any failure.
+        jit_next(b"probe", 0)
+        jit_all(b"probe")
+        return jit_next, jit_all
+    except Exception:
+        _CLASS_TBL = _CLASS
+        return _scan_regex, _scan_all_from(_scan_regex)
+
+
+scan_next, scan_all = _select_backend()
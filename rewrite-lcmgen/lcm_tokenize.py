@@ -0,0 +1,365 @@
+"""Incremental tokenizer for the LCM type-definition grammar.
+
+This is a Python port of lcmgen/tokenize.c. The tokenizer hands out one
+token at a time via tokenize_next()/tokenize_peek(); the token text and
+its source position are left in fields on the Tokenize state object.
+
+The whole source file is read up-front into memory as bytes, so the
+scanner works on integer codepoints rather than one-character strings;
+tokens are decoded to str only when they complete.
+"""
+
+import bisect
+import concurrent.futures
+import dataclasses
+import enum
+import mmap
+import os
+import re
+import sys
+from pathlib import Path
+from typing import List, Optional
+
+import _lcm_scan
+from _lcm_scan import OPERATOR_CHARS, SINGLE_CHAR_TOKENS, WHITESPACE
+
+_BACKSLASH = ord("\\")
+_TAB = ord("\t")
+_NEWLINE = ord("\n")
+
+
+@dataclasses.dataclass(slots=True)
+class Token:
+    """A completed token and its source position."""
+
+    token: str
+    token_type: "TokenType"
+    token_line: int
+    token_column: int
+
+
+class TokenType(enum.Enum):
+    INVALID = 0
+    EOF = 1
+    COMMENT = 2
+    OTHER = 3
+
+
+@dataclasses.dataclass(slots=True)
+class Tokenize:
+    """Tokenizer state. Incrementally tokenizes an in-memory buffer."""
+
+    path: Path
+    buffer: bytes
+
+    # Offset of the first character of each line, so a buffer offset
+    # maps to line/column with one bisection instead of per-character
+    # counting.
+    line_starts: List[int]
+
+    # Our position in the input stream. Lookahead is done by indexing
+    # the buffer directly, so there is no unget machinery.
+    current_pos: int = 0
+
+    # The current token's raw span in the buffer. Tokens that need no
+    # post-processing are decoded lazily from the span by the `token`
+    # property; post-processed tokens are stored in _token directly.
+    token_start: int = 0
+    token_end: int = 0
+    _token: Optional[str] = None
+    token_type: TokenType = TokenType.INVALID
+
+    # Line and column indices for the last returned token.
+    token_line: int = -1
+    token_column: int = -1
+
+    # A peeked-but-not-consumed token, as (token_start, token_end,
+    # _token, token_type, token_line, token_column), or None.
+    _peeked: Optional[tuple] = None
+
+    # The peeked token's type as a TokenType value, or -1 when no peek
+    # is cached. Callers can test the upcoming token with one attribute
+    # load and an integer compare instead of re-entering the peek path.
+    peek_kind: int = -1
+
+    def close(self):
+        """Release the underlying buffer (the mmap, if the file was mapped)."""
+        if isinstance(self.buffer, mmap.mmap):
+            self.buffer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    @property
+    def token(self):
+        """The current token's text, materialized on first access."""
+        token = self._token
+        if token is None:
+            token = self.buffer[self.token_start : self.token_end].decode("utf-8")
+            # Identifiers, keywords and punctuation recur constantly
+            # across files; interned, later == checks against them
+            # short-circuit on pointer identity. String literals (the
+            # other span-decoded kind) are left alone.
+            if not token.startswith('"'):
+                token = sys.intern(token)
+            self._token = token
+        return token
+
+    @token.setter
+    def token(self, value):
+        self._token = value
+
+
+# Files at least this large are memory-mapped instead of copied; below
+# it the mmap setup costs more than the copy it saves.
+_MMAP_THRESHOLD = 64 * 1024
+
+
+def read_file(path):
+    """Read the file at `path` into a tokenizer buffer.
+
+    Small files are read into memory; large files are memory-mapped so
+    the scanner works on a zero-copy view of the page cache. Reading is
+    the only I/O the tokenizer does, so callers may run this on a
+    worker thread and hand the buffer to create_from_bytes() later.
+    """
+    path = Path(path)
+    if path.stat().st_size >= _MMAP_THRESHOLD:
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            return mmap.mmap(fd, 0, access=mmap.ACCESS_READ)
+        finally:
+            os.close(fd)
+    return path.read_bytes()
+
+
+def create_from_bytes(data, path):
+    """Create a tokenizer over an already-read buffer.
+
+    `path` is used only for error messages.
+    """
+    return Tokenize(path=Path(path), buffer=data, line_starts=_line_starts(data))
+
+
+def create(path):
+    """Create a tokenizer for the file at `path`."""
+    return create_from_bytes(read_file(path), path)
+
+
+def _line_starts(data):
+    """Offsets of the first character of each line of `data`."""
+    starts = [0]
+    pos = data.find(b"\n")
+    while pos != -1:
+        starts.append(pos + 1)
+        pos = data.find(b"\n", pos + 1)
+    return starts
+
+
+# Escape-sequence translation, indexed by the byte following a
+# backslash: identity except for the recognized escapes, so unescaping
+# is a single indexed load.
+_ESCAPES = bytearray(range(256))
+_ESCAPES[ord("n")] = _NEWLINE
+_ESCAPES[ord("r")] = ord("\r")
+_ESCAPES[ord("t")] = _TAB
+_ESCAPES = bytes(_ESCAPES)
+
+
+_RE_ESCAPE_PAIR = re.compile(rb"\\(.)", re.DOTALL)
+
+
+def unescape(c):
+    return _ESCAPES[c]
+
+
+def _unescape_match(match):
+    c = match.group(1)[0]
+    return _ESCAPES[c : c + 1]
+
+
+def _strip_extended_comment(body):
+    """Strip decoration from the body of a '/* ... */' comment.
+
+    `body` is the raw bytes between the comment delimiters. Lines
+    decorated with leading asterisks lose the decoration (and one space
+    after it); undecorated lines are kept verbatim. A line keeps its
+    newline only if it contributed content.
+    """
+    lines = body.split(b"\n")
+    final = len(lines) - 1
+    parts = []
+
+    for i, line in enumerate(lines):
+        stripped = line.lstrip(b" \t")
+        if stripped[:1] == b"*":
+            content = stripped.lstrip(b"*")
+            # If a space immediately follows the asterisks, skip it.
+            if content[:1] == b" ":
+                content = content[1:]
+        elif i == final and not stripped:
+            # The '*' of the terminating "*/" extends the (empty)
+            # asterisk run, dropping a final line of pure whitespace.
+            content = b""
+        else:
+            content = line
+        if content:
+            parts.append(content)
+            if i != final:
+                parts.append(b"\n")
+
+    return b"".join(parts).decode("utf-8")
+
+
+def tokenize_next_internal(t):
+    """Chunkify tokens. Returns None at end of input."""
+    return _emit(t, _lcm_scan.scan_next(t.buffer, t.current_pos))
+
+
+def _emit(t, scanned):
+    """Turn one raw scan_next tuple into the tokenizer's current token."""
+    kind, start, end, new_pos = scanned
+
+    t.token_start = t.token_end = 0
+    t._token = None
+    t.token_type = TokenType.INVALID
+
+    if kind == _lcm_scan.SCAN_EOF:
+        t.current_pos = new_pos
+        t.token_type = TokenType.EOF
+        return None
+
+    # A token is starting. Mark its position (lines are 1-based, columns
+    # 0-based).
+    t.token_line = bisect.bisect_right(t.line_starts, start)
+    t.token_column = start - t.line_starts[t.token_line - 1]
+    t.current_pos = new_pos
+
+    if kind == _lcm_scan.SCAN_OTHER:
+        # The common case: the token is exactly its raw span, so leave
+        # decoding to the `token` property.
+        t.token_start = start
+        t.token_end = end
+        t.token_type = TokenType.OTHER
+        return end - start
+
+    raw = t.buffer[start:end]
+
+    if kind == _lcm_scan.SCAN_CHAR_LITERAL:
+        if raw[1] == _BACKSLASH:
+            t.token = "'" + chr(unescape(raw[2])) + "'"
+        else:
+            t.token = raw.decode("utf-8")
+        t.token_type = TokenType.OTHER
+        return len(t.token)
+
+    if kind in (_lcm_scan.SCAN_STRING, _lcm_scan.SCAN_STRING_UNTERMINATED):
+        closed = kind == _lcm_scan.SCAN_STRING
+        body = raw[1:-1] if closed else raw[1:]
+        t.token_type = TokenType.OTHER
+
+        # With no escapes the token is exactly its raw span. Otherwise,
+        # translate escape sequences into the characters they denote.
+        # (The C tokenizer consumed escapes without re-emitting them,
+        # silently corrupting string tokens.)
+        if b"\\" not in body:
+            t.token_start = start
+            t.token_end = end
+            return end - start
+
+        body = _RE_ESCAPE_PAIR.sub(_unescape_match, body)
+        # A lone backslash at end of input escapes nothing.
+        if body.endswith(b"\\"):
+            body = body[:-1]
+        t.token = '"' + body.decode("utf-8") + ('"' if closed else "")
+        return len(t.token)
+
+    if kind == _lcm_scan.SCAN_LINE_COMMENT:
+        # Strip the leading '/' characters, then leading spaces.
+        t.token = raw.lstrip(b"/").lstrip(b" ").decode("utf-8")
+        t.token_type = TokenType.COMMENT
+        return len(t.token)
+
+    if kind == _lcm_scan.SCAN_BLOCK_COMMENT:
+        t.token = _strip_extended_comment(raw[2:-2])
+        t.token_type = TokenType.COMMENT
+        return len(t.token)
+
+    if kind == _lcm_scan.SCAN_BLOCK_COMMENT_UNTERMINATED:
+        print("%s : EOF reached while parsing comment" % t.path)
+        return None
+
+    # SCAN_INVALID: a malformed token (e.g. an unterminated character
+    # literal).
+    return None
+
+
+def tokenize_next(t):
+    """Advance to the next token. Returns None at end of input."""
+    if t._peeked is not None:
+        (
+            t.token_start,
+            t.token_end,
+            t._token,
+            t.token_type,
+            t.token_line,
+            t.token_column,
+        ) = t._peeked
+        t._peeked = None
+        t.peek_kind = -1
+        return 0
+
+    return tokenize_next_internal(t)
+
+
+def tokenize_file(path):
+    """Tokenize the whole file at `path` into a list of Tokens.
+
+    Raw-scans the buffer in one scan_all() call, so a JIT-compiled
+    scanner is entered once per file rather than once per token.
+    """
+    with create(path) as t:
+        tokens = []
+        for scanned in _lcm_scan.scan_all(t.buffer):
+            if _emit(t, scanned) is None:
+                break
+            tokens.append(Token(t.token, t.token_type, t.token_line, t.token_column))
+        return tokens
+
+
+def tokenize_files(paths, max_workers=None):
+    """Tokenize many files in parallel, one worker process per core.
+
+    Tokenizing is CPU-bound and per-file independent, so worker
+    processes scale with cores where threads would serialize on the
+    GIL. Returns the token lists in the same order as `paths`.
+    """
+    paths = list(paths)
+    if len(paths) <= 1:
+        return [tokenize_file(path) for path in paths]
+    with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as pool:
+        return list(pool.map(tokenize_file, paths))
+
+
+def tokenize_peek(t):
+    """Examine the next token without consuming it. Returns None at EOF."""
+    if t._peeked is not None:
+        return 0
+
+    res = tokenize_next_internal(t)
+    if res is not None:
+        t._peeked = (
+            t.token_start,
+            t.token_end,
+            t._token,
+            t.token_type,
+            t.token_line,
+            t.token_column,
+        )
+        t.peek_kind = t.token_type.value
+
+    return res
@@ -0,0 +1,727 @@
+"""Parser for the LCM type-definition grammar.
+
+The LCM grammar is implemented here with a recursive-descent parser;
+handle_file() is the top-level entry point. This is a Python port of the
+parsing half of lcmgen/lcmgen.c. Only modern struct/const declarations
+are supported -- the deprecated `enum` syntax is not.
+
+Every LCM type has an associated "signature", which is a hash of various
+components of its declaration. If the declaration changes, the hash
+changes with high probability.
+"""
+
+import dataclasses
+import enum
+import functools
+import sys
+from ctypes import c_uint64
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+import lcm_tokenize
+from lcm_tokenize import Tokenize, TokenType
+
+# Hot comparisons bind these once instead of resolving the enum
+# attribute per token.
+_COMMENT = TokenType.COMMENT
+_COMMENT_KIND = TokenType.COMMENT.value
+
+# Module-level bindings resolve the tokenizer entry points with one
+# LOAD_GLOBAL instead of a module-attribute lookup per call.
+_tokenize_next = lcm_tokenize.tokenize_next
+_tokenize_peek = lcm_tokenize.tokenize_peek
+
+# LCM's built-in types. Note that unsigned types are not present because
+# there is no safe java implementation. Really, you don't want to add
+# unsigned types.
+PRIMITIVE_TYPES = frozenset((
+    "int8_t",
+    "int16_t",
+    "int32_t",
+    "int64_t",
+    "byte",
+    "float",
+    "double",
+    "string",
+    "boolean",
+))
+
+# Which types can be legally used as array dimensions?
+ARRAY_DIMENSION_TYPES = frozenset(("int8_t", "int16_t", "int32_t", "int64_t"))
+
+# Which types can be legally used as const values?
+CONST_TYPES = frozenset(("int8_t", "int16_t", "int32_t", "int64_t", "float", "double"))
+
+# Value ranges of the integer const types.
+INT_TYPES = {
+    "int8_t": (-(2 ** 7), 2 ** 7 - 1),
+    "int16_t": (-(2 ** 15), 2 ** 15 - 1),
+    "int32_t": (-(2 ** 31), 2 ** 31 - 1),
+    "int64_t": (-(2 ** 63), 2 ** 63 - 1),
+}
+
+# The floating-point const types.
+_FLOAT_TYPES = frozenset(("float", "double"))
+
+# Largest magnitude representable by a single-precision float.
+FLT_MAX = 3.4028234663852886e38
+
+
+class DimensionMode(enum.Enum):
+    CONST = 0
+    VAR = 1
+
+
+# The dimension-mode values as plain ints. Member.dim_modes stores
+# these, and the parse/dump/hash paths compare against them directly;
+# the enum stays around for external consumers.
+DIM_CONST = DimensionMode.CONST.value
+DIM_VAR = DimensionMode.VAR.value
+
+
+@dataclasses.dataclass(slots=True)
+class LcmTypename:
+    # Fully-qualified name, e.g. "edu.mit.dgc.laser_t".
+    lctypename: str
+    # Package name, e.g. "edu.mit.dgc". Empty if none.
+    package: str
+    # E.g. "laser_t".
+    shortname: str
+
+
+@dataclasses.dataclass(slots=True)
+class Member:
+    # The type of this member, or the type of the elements if an array.
+    type: LcmTypename
+    membername: str
+    # Array dimensions, stored as parallel lists of DIM_CONST/DIM_VAR
+    # ints and size strings; empty for non-array members.
+    dim_modes: List[int] = dataclasses.field(default_factory=list)
+    dim_sizes: List[str] = dataclasses.field(default_factory=list)
+    comment: Optional[str] = None
+
+
+@dataclasses.dataclass(slots=True)
+class Constant:
+    lctypename: str
+    membername: str
+    # The value as it appeared in the source file.
+    val_str: str
+    # The parsed value (int or float depending on lctypename).
+    value: object = None
+    comment: Optional[str] = None
+
+
+@dataclasses.dataclass(slots=True)
+class Struct:
+    # The .lcm file the struct was declared in.
+    lcmfile: Path
+    structname: LcmTypename
+    members: List[Member] = dataclasses.field(default_factory=list)
+    constants: List[Constant] = dataclasses.field(default_factory=list)
+    # Name-indexed views of members/constants, maintained at append
+    # time so name lookups are O(1).
+    members_by_name: Dict[str, Member] = dataclasses.field(default_factory=dict)
+    constants_by_name: Dict[str, Constant] = dataclasses.field(default_factory=dict)
+    # Every member and constant name, for a one-probe duplicate check.
+    used_names: Set[str] = dataclasses.field(default_factory=set)
+    structs: List["Struct"] = dataclasses.field(default_factory=list)
+    hash: int = 0
+    comment: Optional[str] = None
+
+
+@dataclasses.dataclass(slots=True)
+class ParseCache:
+    """Transient state carried between parse functions."""
+
+    # The most recently parsed comment block, used to document whatever
+    # declaration follows it.
+    comment_doc: Optional[str] = None
+
+
+@dataclasses.dataclass(slots=True)
+class Lcmgen:
+    """A parsing context: options plus everything parsed so far."""
+
+    package: str = ""
+    structs: List[Struct] = dataclasses.field(default_factory=list)
+    cache: ParseCache = dataclasses.field(default_factory=ParseCache)
+
+    # Options from the command line.
+    package_prefix: str = ""
+    tokenize_dump: bool = False
+
+
+def is_primitive_type(typename):
+    return typename in PRIMITIVE_TYPES
+
+
+def is_array_dimension_type(typename):
+    return typename in ARRAY_DIMENSION_TYPES
+
+
+def is_legal_const_type(typename):
+    return typename in CONST_TYPES
+
+
+def is_legal_member_name(name):
+    return name[0].isalpha() or name[0] == "_"
+
+
+_MASK64 = 0xFFFFFFFFFFFFFFFF
+_SIGN64 = 1 << 63
+
+
+def hash_update(v, c):
+    """Make the hash dependent on the value of the given character.
+
+    The order that hash_update is called in IS important.
+    """
+    v = ((v << 8) ^ (v >> 55)) + c
+
+    # Wrap to int64 with plain arithmetic, like the C implementation;
+    # masking plus sign-extension avoids a ctypes round-trip.
+    v &= _MASK64
+    return v - 0x10000000000000000 if v >= _SIGN64 else v
+
+
+def hash_string_update(v, s):
+    """Make the hash dependent on each character in a string."""
+    data = s.encode("utf-8")
+    v = hash_update(v, len(data))
+
+    # hash_update inlined: iterating bytes yields ints directly, and
+    # plain mask-and-sign-extend arithmetic wraps to int64 without a
+    # ctypes crossing per character.
+    for c in data:
+        v = (((v << 8) ^ (v >> 55)) + c) & _MASK64
+        if v >= _SIGN64:
+            v -= 1 << 64
+
+    return v
+
+
+@functools.lru_cache(maxsize=4096)
+def _hash_string_update_cached(v, s):
+    """Memoized hash_string_update for the struct-hashing path.
+
+    Type names and well-known member names (utime, timestamp, ...)
+    recur across structs, so repeated (state, string) pairs hit the
+    cache instead of re-walking the string.
+    """
+    return hash_string_update(v, s)
+
+
+def hash_structure(structure):
+    """Compute the type signature of a struct.
+
+    Purposefully, we do NOT include the struct name in the hash: this
+    allows people to rename data types and still have them work.
+
+    In contrast, we DO hash the types of a struct's members (and their
+    names).
+    """
+    v = 0x12345678
+
+    for member in structure.members:
+        # Hash the member name.
+        v = _hash_string_update_cached(v, member.membername)
+
+        # If the member is a primitive type, include the type signature
+        # in the hash. Do not include it for compound members, because
+        # their contents will be included, and we don't want a struct's
+        # name change to break the hash.
+        if is_primitive_type(member.type.lctypename):
+            v = _hash_string_update_cached(v, member.type.lctypename)
+
+        # Hash the dimensionality information.
+        v = hash_update(v, len(member.dim_modes))
+        for mode, size in zip(member.dim_modes, member.dim_sizes):
+            v = hash_update(v, mode)
+            v = _hash_string_update_cached(v, size)
+
+    return v
+
+
+def create_typename(lcmgen, raw_typename):
+    """Parse a type into package and class name.
+
+    If no package is specified, we will try to use the package from the
+    last specified "package" directive, like in Java.
+    """
+    lctypename = raw_typename
+
+    # Package name: everything before the last ".", or "" if there is
+    # no ".". Shortname: everything after the last ".", or everything if
+    # there is no ".". rpartition does the split in one call.
+    package, sep, shortname = raw_typename.rpartition(".")
+    if not sep and not is_primitive_type(shortname):
+        # We're overriding the package name using the last directive.
+        package = lcmgen.package
+        if package:
+            lctypename = package + "." + shortname
+
+    if lcmgen.package_prefix and not is_primitive_type(shortname):
+        package = lcmgen.package_prefix + ("." if package else "") + package
+        lctypename = package + "." + shortname
+
+    return LcmTypename(lctypename=lctypename, package=package, shortname=shortname)
+
+
+def _source_line(t):
+    """The text of the line the current token started on."""
+    # Slice the one line out via line_starts rather than splitting the
+    # whole buffer; mmap buffers (large files) have no splitlines().
+    if 1 <= t.token_line <= len(t.line_starts):
+        start = t.line_starts[t.token_line - 1]
+        end = t.buffer.find(b"\n", start)
+        if end == -1:
+            end = len(t.buffer)
+        return t.buffer[start:end].decode("utf-8", "replace")
+    return ""
+
+
+def semantic_error(t, msg):
+    """Semantic error: it parsed fine, but it's illegal. Does not return."""
+    print()
+    print(msg)
+    print()
+    print("%s : %i" % (t.path, t.token_line))
+    print(_source_line(t))
+    sys.exit(1)
+
+
+def semantic_warning(t, msg):
+    """Semantic warning: it parsed fine, but it's dangerous."""
+    print()
+    print(msg)
+    print()
+    print("%s : %i" % (t.path, t.token_line))
+    print(_source_line(t))
+
+
+# translate() table for the error-caret margin: ASCII whitespace keeps
+# its rendered width (tabs especially), everything else becomes a space.
+_MARGIN_TABLE = {i: i if chr(i).isspace() else 0x20 for i in range(128)}
+
+
+def parse_error(t, msg):
+    """Parsing error: we cannot continue. Does not return."""
+    print()
+    print(msg)
+    print()
+    print("%s : %i" % (t.path, t.token_line))
+    line = _source_line(t)
+    print(line)
+    margin = line[: t.token_column].translate(_MARGIN_TABLE)
+    print(margin + "^")
+    sys.exit(1)
+
+
+def parse_try_consume_comment(lcmgen, t, store_comment_doc):
+    """Consume any available comments, optionally storing them as the
+    comment-doc for the next declaration."""
+    if store_comment_doc:
+        lcmgen.cache.comment_doc = None
+
+    # Local aliases: this loop runs per token, and LOAD_FAST beats
+    # LOAD_GLOBAL + LOAD_ATTR per iteration.
+    _peek = _tokenize_peek
+    _next = _tokenize_next
+
+    while True:
+        # Most calls see no comment; with a peek already cached this
+        # exit is one attribute load and an integer compare.
+        kind = t.peek_kind
+        if kind < 0:
+            if _peek(t) is None:
+                return
+            kind = t.peek_kind
+        if kind != _COMMENT_KIND:
+            return
+        _next(t)
+
+        if store_comment_doc:
+            if lcmgen.cache.comment_doc is None:
+                lcmgen.cache.comment_doc = t.token
+            else:
+                lcmgen.cache.comment_doc = lcmgen.cache.comment_doc + "\n" + t.token
+
+
+def parse_try_consume(t, token):
+    """If the next non-comment token is `token`, consume it and return
+    True. Else, return False."""
+    parse_try_consume_comment(None, t, False)
+    res = _tokenize_peek(t)
+    if res is None:
+        parse_error(t, "End of file while looking for %s." % token)
+
+    res = t.token_type != _COMMENT and t.token == token
+
+    # Consume if the token matched.
+    if res:
+        _tokenize_next(t)
+
+    return res
+
+
+def parse_require(t, token):
+    """Consume the next token. If it's not `token`, an error is emitted
+    and the program exits."""
+    parse_try_consume_comment(None, t, False)
+    _next = _tokenize_next
+    while True:
+        res = _next(t)
+        if t.token_type != _COMMENT:
+            break
+
+    if res is None or t.token != token:
+        parse_error(t, "expected token %s" % token)
+
+
+def _read_next_noncomment(t, description):
+    """Advance past any comments to the next token and return its text.
+
+    Fuses the consume-comments/require-token pair used by every reader
+    that does not store comment docs. `description` is a human-readable
+    description of what was expected to be read.
+    """
+    _next = _tokenize_next
+    while True:
+        res = _next(t)
+        if res is None:
+            parse_error(t, "End of file reached, expected %s." % description)
+        if t.token_type != _COMMENT:
+            return t.token
+
+
+def parse_const(lcmgen, structure, t):
+    _read_next_noncomment(t, "type identifier")
+
+    # Get the constant type.
+    if not is_legal_const_type(t.token):
+        parse_error(t, "invalid type for const")
+    lctypename = t.token
+
+    while True:
+        # Get the member name.
+        _read_next_noncomment(t, "name identifier")
+        if not is_legal_member_name(t.token):
+            parse_error(t, "Invalid member name: must start with [a-zA-Z_].")
+        membername = t.token
+
+        # Make sure this name isn't already taken.
+        if membername in structure.used_names:
+            semantic_error(t, "Duplicate member name '%s'." % membername)
+
+        # Get the value.
+        parse_require(t, "=")
+        _read_next_noncomment(t, "constant value")
+
+        # Create a new const member.
+        constant = Constant(lctypename=lctypename, membername=membername, val_str=t.token)
+
+        # Attach the last comment if one was defined.
+        if lcmgen.cache.comment_doc is not None:
+            constant.comment = lcmgen.cache.comment_doc
+            lcmgen.cache.comment_doc = None
+
+        if lctypename in INT_TYPES:
+            try:
+                value = int(constant.val_str, 0)
+            except ValueError:
+                parse_error(t, "Expected integer value")
+            minval, maxval = INT_TYPES[lctypename]
+            if not minval <= value <= maxval:
+                semantic_error(t, "Integer value out of range for %s" % lctypename)
+            constant.value = value
+        elif lctypename in _FLOAT_TYPES:
+            try:
+                value = float(constant.val_str)
+            except ValueError:
+                parse_error(t, "Expected floating point value")
+            if lctypename == "float" and not -FLT_MAX <= value <= FLT_MAX:
+                semantic_error(t, "Floating point value out of range for float")
+            constant.value = value
+        else:
+            raise AssertionError(constant.val_str)
+
+        structure.constants.append(constant)
+        structure.constants_by_name[membername] = constant
+        structure.used_names.add(membername)
+
+        if not parse_try_consume(t, ","):
+            break
+
+    parse_require(t, ";")
+    return 0
+
+
+def parse_member(lcmgen, structure, t):
+    """Parse a member declaration. This looks long and scary, but most of
+    the code is for semantic analysis (error checking)."""
+
+    # Read a type specification. Then read members (multiple members can
+    # be defined per-line.) Each member can have different array
+    # dimensionalities.
+
+    # Inline type declaration?
+    if parse_try_consume(t, "struct"):
+        parse_error(t, "recursive structs not implemented.")
+    elif parse_try_consume(t, "enum"):
+        parse_error(t, "enums are not supported.")
+    elif parse_try_consume(t, "const"):
+        return parse_const(lcmgen, structure, t)
+
+    # Standard declaration.
+    _read_next_noncomment(t, "type identifier")
+
+    if not (t.token[0].isalpha() or t.token[0] == "_"):
+        parse_error(t, "invalid type name")
+
+    # A common mistake is to use 'int' as a type instead of 'intN_t'.
+    if t.token == "int":
+        semantic_warning(t, "int type should probably be int8_t, int16_t, int32_t, or int64_t")
+
+    member_type = create_typename(lcmgen, t.token)
+
+    while True:
+        # Get the lcm type name.
+        _read_next_noncomment(t, "name identifier")
+
+        if not is_legal_member_name(t.token):
+            parse_error(t, "Invalid member name: must start with [a-zA-Z_].")
+        membername = t.token
+
+        # Make sure this name isn't already taken.
+        if membername in structure.used_names:
+            semantic_error(t, "Duplicate member name '%s'." % membername)
+
+        # Create a new member.
+        member = Member(type=member_type, membername=membername)
+        if lcmgen.cache.comment_doc is not None:
+            member.comment = lcmgen.cache.comment_doc
+            lcmgen.cache.comment_doc = None
+        structure.members.append(member)
+        structure.members_by_name[membername] = member
+        structure.used_names.add(membername)
+
+        # (multi-dimensional) array declaration?
+        while parse_try_consume(t, "["):
+            # Pull out the size of the dimension, either a number or a
+            # variable name.
+            size_arg = _read_next_noncomment(t, "array size")
+
+            # A first-character range test decides the branch without
+            # isdigit()'s full-string scan; identifiers (the common
+            # case) short-circuit immediately. This also matches the C
+            # implementation, which tests isdigit(size[0]).
+            if "0" <= size_arg[0] <= "9":
+                # We have a constant size array declaration.
+                try:
+                    size = int(size_arg)
+                except ValueError:
+                    size = 0
+                if size <= 0:
+                    semantic_error(t, "Constant array size must be > 0")
+
+                dim_mode, dim_size = DIM_CONST, size_arg
+            else:
+                # We have a variable sized declaration.
+                if size_arg[0] == "]":
+                    semantic_error(
+                        t, "Array sizes must be declared either as a constant or variable."
+                    )
+                if not is_legal_member_name(size_arg):
+                    semantic_error(t, "Invalid array size variable name: must start with [a-zA-Z_].")
+
+                const_dim_var = find_const(structure, size_arg)
+                if const_dim_var is not None:
+                    if not is_array_dimension_type(const_dim_var.lctypename):
+                        semantic_error(t, "Array dimension '%s' must be an integer type." % size_arg)
+
+                    dim_mode, dim_size = DIM_CONST, const_dim_var.val_str
+                else:
+                    # Make sure the named variable is
+                    # 1) previously declared and
+                    # 2) an integer type
+                    dim_member = find_member(structure, size_arg)
+                    if dim_member is None:
+                        semantic_error(
+                            t,
+                            "Unknown variable array index '%s'. Index variables must be "
+                            "declared before the array." % size_arg,
+                        )
+                    if len(dim_member.dim_modes) != 0:
+                        semantic_error(t, "Array dimension '%s' must not be an array type." % size_arg)
+                    if not is_array_dimension_type(dim_member.type.lctypename):
+                        semantic_error(t, "Array dimension '%s' must be an integer type." % size_arg)
+
+                    dim_mode, dim_size = DIM_VAR, size_arg
+
+            parse_require(t, "]")
+
+            # Increase the dimensionality of the array by one dimension.
+            member.dim_modes.append(dim_mode)
+            member.dim_sizes.append(dim_size)
+
+        if not parse_try_consume(t, ","):
+            break
+
+    parse_require(t, ";")
+
+    return 0
+
+
+def parse_struct(lcmgen, lcmfile, t):
+    """Parse a struct. Assumes the "struct" token is already consumed."""
+    name = _read_next_noncomment(t, "struct name")
+
+    structure = Struct(lcmfile=lcmfile, structname=create_typename(lcmgen, name))
+
+    if lcmgen.cache.comment_doc is not None:
+        structure.comment = lcmgen.cache.comment_doc
+        lcmgen.cache.comment_doc = None
+
+    parse_require(t, "{")
+
+    while True:
+        # Check for leading comments that will be used to document the
+        # next member.
+        parse_try_consume_comment(lcmgen, t, True)
+
+        if parse_try_consume(t, "}"):
+            break
+        parse_member(lcmgen, structure, t)
+
+    structure.hash = hash_structure(structure)
+
+    return structure
+
+
+def find_struct(lcmgen, package, name):
+    for structure in lcmgen.structs:
+        if structure.structname.package == package and structure.structname.shortname == name:
+            return structure
+    return None
+
+
+def parse_entity(lcmgen, lcmfile, t):
+    """Parse one top-level construct. Returns None at end of file."""
+    parse_try_consume_comment(lcmgen, t, True)
+
+    res = _tokenize_next(t)
+    if res is None:
+        return None
+
+    if t.token == "package":
+        lcmgen.package = _read_next_noncomment(t, "package name")
+        parse_require(t, ";")
+        return 0
+
+    if t.token == "struct":
+        structure = parse_struct(lcmgen, lcmfile, t)
+
+        # Check for duplicate types.
+        prior = find_struct(lcmgen, structure.structname.package, structure.structname.shortname)
+        if prior is not None:
+            print(
+                "ERROR:  duplicate type %s declared in %s"
+                % (structure.structname.lctypename, lcmfile)
+            )
+            print(
+                "        %s was previously declared in %s"
+                % (structure.structname.lctypename, prior.lcmfile)
+            )
+            return 1
+        lcmgen.structs.append(structure)
+        return 0
+
+    if t.token == "enum":
+        parse_error(t, "enums are not supported; use a struct with int constants.")
+
+    parse_error(t, "Missing struct token.")
+    return 1
+
+
+def handle_file_bytes(lcmgen, path, data):
+    """Parse an already-read buffer as the contents of the file at `path`."""
+    # The context manager releases the mmap even if a parse error
+    # raises or exits mid-file.
+    with lcm_tokenize.create_from_bytes(data, path) as t:
+        if lcmgen.tokenize_dump:
+            ntok = 0
+            print("%6s %6s %6s: %s" % ("tok#", "line", "col", "token"))
+
+            while _tokenize_next(t) is not None:
+                print("%6i %6i %6i: %s" % (ntok, t.token_line, t.token_column, t.token))
+                ntok += 1
+            return 0
+
+        res = 0
+        while res == 0:
+            res = parse_entity(lcmgen, path, t)
+
+    if res is None:
+        return 0
+    return res
+
+
+def handle_file(lcmgen, path):
+    return handle_file_bytes(lcmgen, path, lcm_tokenize.read_file(path))
+
+
+def dump_typename(lt):
+    return "\t%-20s" % lt.lctypename
+
+
+def dump_member(member):
+    parts = [dump_typename(member.type), "  ", member.membername]
+
+    for mode, size in zip(member.dim_modes, member.dim_sizes):
+        if mode == DIM_CONST:
+            parts.append(" [ (const) %s ]" % size)
+        elif mode == DIM_VAR:
+            parts.append(" [ (var) %s ]" % size)
+        else:
+            raise AssertionError(mode)
+
+    parts.append("\n")
+    return "".join(parts)
+
+
+def dump_struct(structure):
+    # Assemble the whole struct's text and write it once, rather than
+    # taking the stdout lock per field.
+    parts = [
+        "struct %s [hash=0x%016x]\n"
+        % (structure.structname.lctypename, c_uint64(structure.hash).value)
+    ]
+    for member in structure.members:
+        parts.append(dump_member(member))
+    sys.stdout.write("".join(parts))
+
+
+def dump_lcmgen(lcmgen):
+    for structure in lcmgen.structs:
+        dump_struct(structure)
+
+
+def find_member(structure, name):
+    """Find and return the member whose name is `name`."""
+    return structure.members_by_name.get(name)
+
+
+def find_const(structure, name):
+    """Find and return the const whose name is `name`."""
+    return structure.constants_by_name.get(name)
+
+
+def is_constant_size_array(member):
+    """Is the member an array of constant size? If it is not an array,
+    returns True."""
+    for mode in member.dim_modes:
+        if mode == DIM_VAR:
+            return False
+
+    return True
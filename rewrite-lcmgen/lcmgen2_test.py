@@ -0,0 +1,65 @@
+#!/usr/bin/python
+import contextlib
+import io
+import tempfile
+import unittest
+from pathlib import Path
+
+import lcm_tokenize
+import lcmgen2
+
+TYPES_DIR = Path(__file__).resolve().parent.parent / "test" / "types" / "lcmtest"
+
+
+class TestStructHash(unittest.TestCase):
+    def parse(self, filename):
+        lcmgen = lcmgen2.Lcmgen()
+        self.assertEqual(lcmgen2.handle_file(lcmgen, TYPES_DIR / filename), 0)
+        return lcmgen
+
+    def test_hash_update_wraps_like_int64(self):
+        """hash_update must wrap with int64 two's-complement semantics."""
+        self.assertEqual(lcmgen2.hash_update(0x7FFFFFFFFFFFFFFF, 0xFF), 0xFE)
+        self.assertEqual(lcmgen2.hash_update(0x12345678, ord("a")), 0x1234567861)
+
+    def test_multidim_array_hash(self):
+        """The hash must match the reference lcm-gen output bit-exactly."""
+        lcmgen = self.parse("multidim_array_t.lcm")
+        (structure,) = lcmgen.structs
+        self.assertEqual(structure.hash & 0xFFFFFFFFFFFFFFFF, 0x1E012473DEB4CFBB)
+
+    def test_arrays_hash(self):
+        lcmgen = self.parse("../lcmtest3/arrays_t.lcm")
+        (structure,) = lcmgen.structs
+        self.assertEqual(structure.hash & 0xFFFFFFFFFFFFFFFF, 0x3F2258E55559FAF8)
+
+
+class TestLargeFile(unittest.TestCase):
+    def test_diagnostics_on_mmapped_buffer(self):
+        """Diagnostics must render source lines from an mmap buffer.
+
+        Files at or above the mmap threshold hand the tokenizer an mmap
+        rather than bytes; nothing in the test corpus crosses the
+        threshold, so build one. The `int` member triggers
+        semantic_warning, which renders the offending source line.
+        """
+        padding = "// %s\n" % ("x" * 78)
+        content = padding * (lcm_tokenize._MMAP_THRESHOLD // len(padding) + 1)
+        content += "struct padded_t\n{\n    int queue;\n}\n"
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / "padded_t.lcm"
+            path.write_text(content)
+            self.assertGreaterEqual(
+                path.stat().st_size, lcm_tokenize._MMAP_THRESHOLD
+            )
+
+            lcmgen = lcmgen2.Lcmgen()
+            out = io.StringIO()
+            with contextlib.redirect_stdout(out):
+                self.assertEqual(lcmgen2.handle_file(lcmgen, path), 0)
+            self.assertIn("    int queue;", out.getvalue())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+"""Command-line driver for the Python LCM type-definition parser."""
+
+import argparse
+import concurrent.futures
+import sys
+from pathlib import Path
+
+import lcm_tokenize
+import lcmgen2
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Parse LCM type definition files.")
+    parser.add_argument("input_files", nargs="+", help=".lcm type definition files")
+    parser.add_argument("-t", "--tokenize", action="store_true", help="show tokenization")
+    parser.add_argument("-d", "--debug", action="store_true", help="show parsed files")
+    parser.add_argument(
+        "--package-prefix",
+        default="",
+        help="add this package name as a prefix to the declared package",
+    )
+    args = parser.parse_args(argv)
+
+    lcmgen = lcmgen2.Lcmgen(package_prefix=args.package_prefix, tokenize_dump=args.tokenize)
+
+    paths = [Path(path) for path in args.input_files]
+
+    if len(paths) <= 1:
+        for path in paths:
+            res = lcmgen2.handle_file(lcmgen, path)
+            if res != 0:
+                return res
+    else:
+        # Prefetch file contents on worker threads: reading is
+        # I/O-bound and thread-safe even though the parser is not, so
+        # disk latency overlaps with parsing the current file. The
+        # files are still parsed serially, in command-line order.
+        with concurrent.futures.ThreadPoolExecutor(max_workers=8) as pool:
+            for path, data in zip(paths, pool.map(lcm_tokenize.read_file, paths)):
+                res = lcmgen2.handle_file_bytes(lcmgen, path, data)
+                if res != 0:
+                    return res
+
+    if args.debug:
+        lcmgen2.dump_lcmgen(lcmgen)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,29 @@
+"""Optional build script: compile the tokenizer and parser with Cython.
+
+The modules are plain Python and run fine uncompiled; building them as
+extension modules strips interpreter frame setup and attribute-lookup
+overhead from the per-token dispatch loops:
+
+    python setup.py build_ext --inplace
+
+The pure-Python sources stay the single source of truth — Cython
+compiles the .py files directly, so no .pyx fork to keep in sync.
+"""
+
+from setuptools import setup
+
+try:
+    from Cython.Build import cythonize
+except ImportError:
+    raise SystemExit(
+        "Cython is required to build the compiled modules; "
+        "the pure-Python modules work without this step."
+    )
+
+setup(
+    name="rewrite-lcmgen",
+    ext_modules=cythonize(
+        ["lcm_tokenize.py", "lcmgen2.py"],
+        language_level=3,
+    ),
+)